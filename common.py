@@ -1,8 +1,16 @@
+import re
 from enum import auto, Enum
+from functools import lru_cache
 from urllib.parse import urlparse, ParseResult
 
+from pyinfra import host
+from pyinfra.facts import server as server_facts
+
 APT_UPDATE_CACHE_TIME: int = 86400  # 24 hours
 
+_URL_RE = re.compile(r'(?i:https?)://[^/?#\s]+/.*')
+"""http(s) scheme, host and non-empty path"""
+
 
 class OS(Enum):
     win = auto()
@@ -17,12 +25,10 @@ class URL:
     _url_str: str
 
     def __init__(self, url):
-        result = urlparse(url)
-        if URL.is_valid(url):
-            self._parsed_url = result
-            self._url_str = url
-        else:
+        if not URL.is_valid(url):
             raise ValueError(f"Invalid URL [{url}]")
+        self._parsed_url = urlparse(url)
+        self._url_str = url
 
     @property
     def parsed(self) -> ParseResult:
@@ -34,5 +40,25 @@ class URL:
 
     @staticmethod
     def is_valid(url_str: str) -> bool:
-        parsed = urlparse(url_str)
-        return all([parsed.scheme, parsed.netloc, parsed.path]) and parsed.scheme in ['http', 'https']
+        return bool(_URL_RE.fullmatch(url_str))
+
+
+_DISTRO_MAP: dict[str, OS] = {
+    'Ubuntu': OS.ubuntu,
+    'Debian': OS.debian,
+    'Fedora': OS.fedora,
+}
+"""LinuxDistribution fact name -> OS"""
+
+
+@lru_cache(maxsize=None)
+def _detect_os(host_name: str) -> OS:
+    distro = _DISTRO_MAP.get(host.get_fact(server_facts.LinuxDistribution)['name'])
+    if distro is None:
+        raise Exception('Unsupported OS')
+    return distro
+
+
+def current_os() -> OS:
+    """OS of the host currently being deployed to, detected once per host."""
+    return _detect_os(host.name)
@@ -0,0 +1,3 @@
+from pyinfra_lib.modify_file import ConfigType
+from .config_edit import ConfigEdit
+from .txt_edit import TxtEdit
@@ -1,2 +0,0 @@
-from .config_edit import ConfigEdit
-from .txt_edit import TxtEdit
\ No newline at end of file
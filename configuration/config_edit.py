@@ -1,11 +1,10 @@
+from dataclasses import dataclass
 from typing import Callable
 from pyinfra_lib import modify_file
 
 
+@dataclass(frozen=True, slots=True)
 class ConfigEdit:
-    def __init__(self, Path: str, EditAction: Callable[[dict | list], dict | list], ConfigType: modify_file.ConfigType = modify_file.ConfigType.JSON):
-        modify_file.modify_structured_config(
-            path=Path,
-            modify_action=EditAction,
-            config_type=ConfigType,
-        )
+    Path: str
+    EditAction: Callable[[dict | list], dict | list]
+    ConfigType: modify_file.ConfigType = modify_file.ConfigType.JSON
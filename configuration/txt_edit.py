@@ -1,9 +1,8 @@
+from dataclasses import dataclass
 from typing import Callable
-from pyinfra_lib import modify_file
 
+
+@dataclass(frozen=True, slots=True)
 class TxtEdit:
-    def __init__(self, Path: str, EditAction: Callable[[str], str]):
-        modify_file.modify_plaintext_file(
-            path=Path,
-            modify_action=EditAction
-        )
\ No newline at end of file
+    Path: str
+    EditAction: Callable[[str], str]
@@ -1,5 +1,5 @@
 from .apt import Apt, AptRepo, AptPpa
 from .dnf import Dnf
 from .snap import Snap
-from .app import App
+from .app import App, handle
 
@@ -1,12 +1,12 @@
 from abc import ABC, abstractmethod
-from typing import List
+from typing import ClassVar, List
 from common import OS
 
 class Installation(ABC):
-    @property
-    @abstractmethod
-    def os(self) -> list[OS]:
-        pass
+    __slots__ = ()
+
+    os: ClassVar[frozenset[OS]]
+    """OSes this installation method is available on"""
 
     @property
     @abstractmethod
@@ -1,98 +1,191 @@
-from abc import abstractmethod
-from enum import Enum, auto
-from pathlib import Path
-from typing import Callable
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from fnmatch import fnmatch
+from io import BytesIO
+from typing import Callable, TypeVar
+from urllib.request import urlopen
 
 from pyinfra import host
-from pyinfra.facts import server as server_facts
-from pyinfra.operations import apt, dnf, snap, server, python
+from pyinfra.facts import files as files_facts
+from pyinfra.operations import apt, dnf, files, snap, server
 
-from common import OS
+from common import OS, APT_UPDATE_CACHE_TIME, current_os
 from pyinfra_lib import modify_file
 from installation import Apt, Dnf, Snap, AptRepo, AptPpa
 from configuration import ConfigEdit, TxtEdit
 
+_T = TypeVar("_T")
+
+APT_SOURCES_DIR = "/etc/apt/sources.list.d"
+APT_TRUSTED_KEYS_DIR = "/etc/apt/trusted.gpg.d"
+
+_downloaded_keys: dict[str, bytes] = {}
+"""key url -> key content, shared by all hosts of the run"""
+
+
+def _ppa_already_present(ppa_str: str) -> bool:
+    # add-apt-repository writes `<user>-ubuntu-<name>-<codename>.list` (`.sources` on newer releases)
+    user, _, name = ppa_str.removeprefix("ppa:").partition("/")
+    sources = host.get_fact(files_facts.FindFiles, path=APT_SOURCES_DIR)
+    return any(fnmatch(source, f"{APT_SOURCES_DIR}/{user}-ubuntu-{name}-*") for source in sources)
+
+
+def _repo_already_present(filename: str) -> bool:
+    return bool(host.get_fact(files_facts.File, path=f"{APT_SOURCES_DIR}/{filename}.list"))
+
+
+def _download_key(url: str) -> bytes:
+    with urlopen(url, timeout=30) as response:
+        return response.read()
+
+
+def _key_extension(key: bytes) -> str:
+    # apt reads armored keys only with .asc extension, binary keyrings with .gpg
+    return "asc" if key.lstrip().startswith(b"-----BEGIN PGP") else "gpg"
+
+
+def _download_keys(urls: set[str]) -> None:
+    urls = urls - _downloaded_keys.keys()
+    if not urls:
+        return
+    # keys are small and fetches are IO-bound, so download them all at once
+    with ThreadPoolExecutor(max_workers=min(8, len(urls))) as executor:
+        _downloaded_keys.update(zip(urls, executor.map(_download_key, urls)))
+
+
+def _chain(actions: list[Callable[[_T], _T]]) -> Callable[[_T], _T]:
+    def chained(config: _T) -> _T:
+        for action in actions:
+            config = action(config)
+        return config
+    return chained
+
 
 class App:
+    __slots__ = ("Installation_by_os", "Settings", "os", "Installation")
+
     def __init__(self, Installation: dict[OS, Apt | Dnf | Snap | str], Settings: list[ConfigEdit | TxtEdit] | None = None):
         self.Installation_by_os = Installation
         self.Settings = Settings
 
-        # Detect current OS
-        distro_name = host.get_fact(server_facts.LinuxDistribution)['name']
-        if distro_name == 'Ubuntu':
-            self.os = OS.ubuntu
-        elif distro_name == 'Debian':
-            self.os = OS.debian
-        elif distro_name == 'Fedora':
-            self.os = OS.fedora
-        else:
-            raise Exception('Unsupported OS')
+        self.os = current_os()
 
         # Select installation for this OS
         if self.os not in self.Installation_by_os:
             raise Exception(f'No installation specified for OS {self.os}')
         self.Installation = self.Installation_by_os[self.os]
 
-        # Provision immediately
-        self._provision()
-
-
-    def _provision(self):
-        inst = self.Installation
-        # Apt
-        if isinstance(inst, Apt):
-            if inst.RepoOrPpa:
-                if isinstance(inst.RepoOrPpa, AptPpa):
-                    apt.ppa(src=inst.RepoOrPpa.PpaStr, _sudo=True)
-                    apt.update()
-                elif isinstance(inst.RepoOrPpa, AptRepo):
-                    apt.key(src=inst.RepoOrPpa.KeyUrl, _sudo=True)
-                    apt.repo(src=inst.RepoOrPpa.RepoSourceStr, filename=inst.name, _sudo=True)
-                    apt.update()
-            apt.packages(
-                packages=[inst.PackageName],
-                cache_time=86400,
-                update=True,
-                _sudo=True
-            )
-        # Dnf
-        elif isinstance(inst, Dnf):
-            dnf.packages(
-                packages=[inst.PackageName],
-                _sudo=True
-            )
-        # Snap
-        elif isinstance(inst, Snap):
-            snap.package(
-                packages=[inst.PackageName],
-                _sudo=True
-            )
-        # String (generic package)
-        elif isinstance(inst, str):
-            server.packages(
-                packages=[inst],
+
+def handle(apps: list[App]):
+    """
+    Generate pyinfra operations for all passed apps.
+    Installations are grouped by package manager, so each manager runs a single transaction.
+    """
+    apt_names: list[str] = []
+    apt_ppas: list[AptPpa] = []
+    apt_repos: list[tuple[AptRepo, str]] = []
+    dnf_names: list[str] = []
+    snap_names: list[str] = []
+    str_names: list[str] = []
+    config_edits: list[ConfigEdit] = []
+    txt_edits: list[TxtEdit] = []
+    names_by_type: dict[type, list[str]] = {Apt: apt_names, Dnf: dnf_names, Snap: snap_names, str: str_names}
+    settings_by_type: dict[type, list] = {ConfigEdit: config_edits, TxtEdit: txt_edits}
+
+    distro = current_os()
+    for app in apps:
+        inst = app.Installation
+        inst_type = type(inst)
+        names = names_by_type.get(inst_type)
+        if names is None:
+            raise Exception(f'Unknown installation type: {inst_type}')
+        if inst_type is str:
+            names.append(inst)
+        elif distro not in inst.os:
+            raise Exception(f'{inst_type.__name__} installation is not available on OS {distro}')
+        else:
+            names.append(inst.name)
+        if inst_type is Apt:
+            if type(inst.RepoOrPpa) is AptPpa:
+                apt_ppas.append(inst.RepoOrPpa)
+            elif type(inst.RepoOrPpa) is AptRepo:
+                apt_repos.append((inst.RepoOrPpa, inst.name))
+
+        for s in app.Settings or ():
+            settings = settings_by_type.get(type(s))
+            if settings is None:
+                raise Exception(f'Unknown setting type: {type(s)}')
+            settings.append(s)
+
+    # Apt
+    if apt_names:
+        # add sources first, then refresh the index once for all of them;
+        # apt.ppa shells out to add-apt-repository on every run, so skip sources that are already configured
+        sources_added = False
+        for ppa in apt_ppas:
+            if not _ppa_already_present(ppa.PpaStr):
+                apt.ppa(src=ppa.PpaStr, _sudo=True)
+                sources_added = True
+        repos = [(repo, filename) for repo, filename in apt_repos if not _repo_already_present(filename)]
+        _download_keys({repo.KeyUrl for repo, _ in repos})  # on the controller, in parallel
+        for repo, filename in repos:
+            key = _downloaded_keys[repo.KeyUrl]
+            files.put(
+                src=BytesIO(key),
+                dest=f"{APT_TRUSTED_KEYS_DIR}/{filename}.{_key_extension(key)}",
+                mode="644",
                 _sudo=True
             )
-        else:
-            raise Exception(f'Unknown installation type: {type(inst)}')
-
-        # Apply settings
-        # TODO: what if we need to wait for the app to be installed before applying settings?
-        if self.Settings:
-            for s in self.Settings:
-                if isinstance(s, ConfigEdit):
-                    modify_file.modify_structured_config(
-                        path=str(s.Path),
-                        modify_action=s.EditAction,
-                        config_type=modify_file.ConfigType[s.ConfigType.name.upper()]
-                    )
-                elif isinstance(s, TxtEdit):
-                    modify_file.modify_plaintext_file(
-                        path=str(s.Path),
-                        modify_action=s.EditAction,
-                    )
-                else:
-                    raise Exception(f'Unknown setting type: {type(s)}')
+            apt.repo(src=repo.RepoSourceStr, filename=filename, _sudo=True)
+            sources_added = True
+        # a full refresh is only needed for new sources, otherwise cache_time decides
+        if sources_added:
+            apt.update(_sudo=True)
+        apt.packages(
+            packages=apt_names,
+            cache_time=APT_UPDATE_CACHE_TIME,
+            update=not sources_added,  # index was just refreshed above
+            _sudo=True
+        )
+    # Dnf
+    if dnf_names:
+        dnf.packages(
+            packages=dnf_names,
+            _sudo=True
+        )
+    # Snap
+    if snap_names:
+        snap.package(
+            packages=snap_names,
+            _sudo=True
+        )
+    # String (generic package)
+    if str_names:
+        server.packages(
+            packages=str_names,
+            _sudo=True
+        )
 
+    # Apply settings
+    # TODO: what if we need to wait for the app to be installed before applying settings?
+    # edits of the same file are chained, so each file is read, parsed and written only once
+    config_edits_by_file: defaultdict[tuple[str, modify_file.ConfigType], list[Callable]] = defaultdict(list)
+    for s in config_edits:
+        config_edits_by_file[(str(s.Path), s.ConfigType)].append(s.EditAction)
+    txt_edits_by_file: defaultdict[str, list[Callable]] = defaultdict(list)
+    for s in txt_edits:
+        txt_edits_by_file[str(s.Path)].append(s.EditAction)
 
+    # modify operations are deliberately not issued from a thread pool: pyinfra orders operations by call order
+    # and its host/state context is not thread-safe; per-host parallelism is already done by pyinfra itself
+    for (path, config_type), actions in config_edits_by_file.items():
+        modify_file.modify_structured_config(
+            path=path,
+            modify_action=_chain(actions),
+            config_type=config_type
+        )
+    for path, actions in txt_edits_by_file.items():
+        modify_file.modify_plaintext_file(
+            path=path,
+            modify_action=_chain(actions),
+        )
@@ -1,8 +1,9 @@
 from dataclasses import dataclass
+from typing import ClassVar
 from common import OS, URL
 from installation.abstract import Installation
 
-@dataclass(frozen=True)
+@dataclass(frozen=True, slots=True)
 class AptRepo:
     KeyUrl: str
     RepoSourceStr: str
@@ -12,21 +13,19 @@ class AptRepo:
         if not URL.is_valid(self.KeyUrl):
             raise ValueError(f"Invalid URL [{self.KeyUrl}]")
 
-@dataclass(frozen=True)
+@dataclass(frozen=True, slots=True)
 class AptPpa:
     PpaStr: str
     """ppa formatted string, e.g. `ppa:mozillateam/ppa`"""
 
-@dataclass(frozen=True)
+@dataclass(frozen=True, slots=True)
 class Apt(Installation):
+    os: ClassVar[frozenset[OS]] = frozenset({OS.ubuntu, OS.debian})
+
     PackageName: str
     RepoOrPpa: AptRepo | AptPpa | None = None
     Version: str | None = None
 
-    @property
-    def os(self) -> list[OS]:
-        return [OS.ubuntu, OS.debian]
-
     @property
     def name(self) -> str:
         return self.PackageName
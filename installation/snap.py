@@ -1,16 +1,15 @@
 from dataclasses import dataclass
+from typing import ClassVar
 from common import OS
 from installation.abstract import Installation
 
-@dataclass(frozen=True)
+@dataclass(frozen=True, slots=True)
 class Snap(Installation):
+    os: ClassVar[frozenset[OS]] = frozenset({OS.ubuntu, OS.debian, OS.fedora})
+
     PackageName: str
     Version: str | None = None
 
-    @property
-    def os(self) -> list[OS]:
-        return [OS.ubuntu, OS.debian, OS.fedora]
-
     @property
     def name(self) -> str:
         return self.PackageName
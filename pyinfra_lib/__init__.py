@@ -1,4 +1,5 @@
 from .modify_file import *
+from .modify_file_fact import *
 from .remote_python import *
 from .remote_python_fact import *
 from .remote_python_util import *
@@ -1,23 +1,35 @@
 import configparser
-import copy
 import datetime
 import inspect
 import json
-import plistlib
+import pickle
+import re
 import traceback
 from enum import Enum
 from io import StringIO
 from typing import Callable, Any, TypeVar
 
-import xmltodict
 from pyinfra import host, logger
-from pyinfra.api import operation, OperationError, OperationValueError, FunctionCommand
-from pyinfra.facts import files as files_fact, server
+from pyinfra.api import operation, OperationError, OperationValueError
+from pyinfra.facts import server
 from pyinfra.operations import files
 
+from pyinfra_lib.modify_file_fact import ConfigFile
+
+
+try:
+    import orjson  # optional, parses large JSON configs several times faster
+except ImportError:
+    orjson = None
+
 
 _T = TypeVar("_T")
 
+_UNCHANGED = object()
+"""returned by modify_structured_config's modify when modify_action changed nothing, skips serialization and upload"""
+
+_user_groups_cache: dict[tuple[str, str], list[str]] = {}
+"""(host name, user) -> groups of the user, saves a lookup in the Users fact that covers every account on the host"""
 
 
 def _deserialize(content: str, deserializer: Callable[[str], _T]) -> _T:
@@ -34,6 +46,20 @@ def _serialize(config: _T, serializer: Callable[[_T], str]) -> str:
         raise OperationError(f"Error while serializing: {repr(e)}")
 
 
+_LONG_NUMBER_RE = re.compile(r"\d{19,}")
+"""digit runs that may be an integer out of the 64-bit range, which orjson silently turns into a float"""
+
+
+def _deserialize_json(content: str) -> dict | list:
+    # any long digit run (also inside strings) goes to stdlib json, which keeps arbitrary precision ints
+    if orjson is not None and not _LONG_NUMBER_RE.search(content):
+        try:
+            return orjson.loads(content)
+        except orjson.JSONDecodeError:
+            pass  # stdlib json also accepts NaN/Infinity
+    return json.loads(content)
+
+
 def _deserialize_ini(content: str) -> dict | list:
     config_parser = configparser.ConfigParser()
     config_parser.read_string(content)
@@ -41,16 +67,21 @@ def _deserialize_ini(content: str) -> dict | list:
 
 
 def _serialize_ini(cfg: dict | list) -> str:
-    config_parser = configparser.ConfigParser()
+    # produces the same output as ConfigParser.write, without the parser's per-line write calls
+    parts = []
     for section, section_config in cfg.items():
-        config_parser[section] = section_config
-    with StringIO() as f:
-        config_parser.write(f)
-        return f.getvalue()
-
-
-def _validate_file_state(path: str, max_file_size_mb: int) -> None:
-    match host.get_fact(files_fact.File, path=path):
+        parts.append(f"[{section}]\n")
+        for key, value in section_config.items():
+            # _deserialize_ini reads with interpolation, so a literal % has to be written back as %%
+            value = str(value).replace("%", "%%")
+            value = value.replace("\n", "\n\t")  # multiline values are continued with an indent
+            parts.append(f"{str(key).lower()} = {value}\n")
+        parts.append("\n")
+    return "".join(parts)
+
+
+def _validate_file_state(path: str, file_state: dict | bool | None, max_file_size_mb: int) -> None:
+    match file_state:
         case None:
             raise OperationValueError(f"Config file {path} not found")
         case False:
@@ -59,11 +90,13 @@ def _validate_file_state(path: str, max_file_size_mb: int) -> None:
             raise OperationValueError(f"Config file {path} is too large to process: {size_bytes / 1024 / 1024} MB")
         case {"mode": mode_int, "user": file_owner, "group": file_group}:  # check if readable/writable
             user: str = host.get_fact(server.User)
-            user_groups: list[str] = host.get_fact(server.Users)[user]["groups"]
-            mode_str = str(mode_int)  # mode_int is 3-digit int e.g. 644
-            owner_can_rw = mode_str[0] in "67"
-            group_can_rw = mode_str[1] in "67"
-            other_can_rw = mode_str[2] in "67"
+            if (host.name, user) not in _user_groups_cache:
+                _user_groups_cache[(host.name, user)] = host.get_fact(server.Users)[user]["groups"]
+            user_groups: list[str] = _user_groups_cache[(host.name, user)]
+            # mode_int is 3-digit int e.g. 644, every digit is an octal rwx triplet, rw- is 6
+            owner_can_rw = (mode_int // 100 % 10) & 6 == 6
+            group_can_rw = (mode_int // 10 % 10) & 6 == 6
+            other_can_rw = (mode_int % 10) & 6 == 6
             if (file_owner == user and owner_can_rw) or (file_group in user_groups and group_can_rw) or other_can_rw:
                 pass
             else:
@@ -121,12 +154,15 @@ def modify_structured_config(
             case _ if not config_str.strip():  # is empty or whitespace
                 config = {}
             case ConfigType.JSON:
-                config = _deserialize(config_str, json.loads)
+                config = _deserialize(config_str, _deserialize_json)
             case ConfigType.INI:
                 config = _deserialize(config_str, _deserialize_ini)
             case ConfigType.XML:
-                config = _deserialize(config_str, xmltodict.parse)
+                import xmltodict  # imported lazily, only XML configs need it
+                # plain dicts are cheaper than the OrderedDicts older xmltodict builds by default
+                config = _deserialize(config_str, lambda content: xmltodict.parse(content, dict_constructor=dict))
             case ConfigType.PLIST:
+                import plistlib
                 config = _deserialize(config_str, lambda content: plistlib.loads(content.encode("utf-8")))
         if not isinstance(config, (dict, list)):
             raise OperationError(
@@ -136,9 +172,14 @@ def modify_structured_config(
         return config
 
     def modify(config: dict | list) -> dict | list:
-        result = modify_action(copy.deepcopy(config))
+        # deserialized configs are plain data, so a pickle round-trip copies them ~5x faster than deepcopy
+        pickled_config = pickle.dumps(config, pickle.HIGHEST_PROTOCOL)
+        result = modify_action(pickle.loads(pickled_config))
         if not isinstance(result, (dict, list)):
             raise OperationError(f"modify_action must return a dict or a list, got {type(result)}")
+        # compared pickled rather than with ==, which treats 1, 1.0 and True as equal
+        if pickle.dumps(result, pickle.HIGHEST_PROTOCOL) == pickled_config:
+            return _UNCHANGED
         return result
 
     def serialize(modified_config: dict | list) -> str:
@@ -149,8 +190,10 @@ def modify_structured_config(
             case ConfigType.INI:
                 modified_config_str = _serialize(modified_config, _serialize_ini)
             case ConfigType.XML:
+                import xmltodict
                 modified_config_str = _serialize(modified_config, lambda cfg: xmltodict.unparse(cfg, pretty=True))
             case ConfigType.PLIST:
+                import plistlib
                 modified_config_str = _serialize(modified_config, lambda cfg: plistlib.dumps(cfg).decode("utf-8"))
         if modified_config_str is None:
             # todo: remove after testing
@@ -193,7 +236,7 @@ def modify_plaintext_file(
     )
     ```
     """
-    yield from modify_custom_config(
+    yield from modify_custom_config._inner(
         path=path,
         modify_action=modify_action,
         deserializer=lambda content: content,
@@ -203,6 +246,83 @@ def modify_plaintext_file(
     )
 
 
+@operation()
+def modify_ini_key(
+    path: str,
+    section: str,
+    key: str,
+    value: str,
+    backup: bool = False,
+    max_file_size_mb: int = 2,
+):
+    """
+    Set a single key of an INI file on the remote host.
+    Unlike modify_structured_config with ConfigType.INI, the file is edited in place, \
+    so comments, ordering and case of the other lines are preserved.
+    Missing key is added at the start of the section, missing section is appended to the file. \
+    Values continued on multiple lines can't be edited in place and fail the operation.
+
+    @param path: The path to the config file.
+    @param section: The section of the key, without brackets.
+    @param key: The key to set, matched case-insensitively like configparser does.
+    @param value: The value to set, must be a single line without leading or trailing whitespace.
+    @param backup: Whether to create a backup of the config file before modifying it.
+    @param max_file_size_mb: The maximum allowed size of the config file in MB.
+
+    Usage:
+    ```
+    structured_config.modify_ini_key(
+        path="/file.ini",
+        section="cars",
+        key="car0",
+        value="Mercedes",
+    )
+    ```
+    """
+    if value != value.strip() or "\n" in value or "\r" in value:
+        raise OperationValueError(f"INI value must be a single line without leading or trailing whitespace, got [{value}]")
+    if any(char in section for char in "]\r\n"):
+        raise OperationValueError(f"INI section name can't contain ']' or line breaks, got [{section}]")
+    if any(char in key for char in "\r\n"):
+        raise OperationValueError(f"INI key can't contain line breaks, got [{key}]")
+
+    def set_key(content: str) -> str:
+        newline = "\r\n" if "\r\n" in content else "\n"  # keep line endings of CRLF files
+        section_match = re.search(rf"^\[{re.escape(section)}\][ \t]*\r?$", content, re.MULTILINE)
+        if section_match is None:
+            separator = newline if content and not content.endswith("\n") else ""
+            return f"{content}{separator}[{section}]{newline}{key} = {value}{newline}"
+
+        # section body ends at the next section header or at the end of the file
+        next_section = re.compile(r"^\[", re.MULTILINE).search(content, section_match.end())
+        section_end = next_section.start() if next_section else len(content)
+        key_match = re.compile(rf"^([ \t]*){re.escape(key)}[ \t]*[=:][ \t]*(.*?)[ \t]*\r?$", re.MULTILINE | re.IGNORECASE) \
+            .search(content, section_match.end(), section_end)
+        if key_match is not None:
+            # configparser continues a value on following lines indented deeper than the key, replacing
+            # only the first line would leave the rest as part of the new value
+            next_line = re.compile(r"^([ \t]*)[^ \t\r\n#;]", re.MULTILINE).search(content, key_match.end(), section_end)
+            if next_line is not None and len(next_line[1]) > len(key_match[1]):
+                raise OperationError(f"Value of [{key}] in section [{section}] spans multiple lines, can't edit it in place")
+            if key_match[2] == value:
+                return content
+            return content[:key_match.start(2)] + value + content[key_match.end(2):]
+
+        insert_at = section_match.end()
+        if content.startswith("\n", insert_at):
+            return content[:insert_at + 1] + f"{key} = {value}{newline}" + content[insert_at + 1:]
+        return f"{content}{newline}{key} = {value}{newline}"  # header is the last line of the file
+
+    yield from modify_custom_config._inner(
+        path=path,
+        modify_action=set_key,
+        deserializer=lambda content: content,
+        serializer=lambda cfg: cfg,
+        backup=backup,
+        max_file_size_mb=max_file_size_mb,
+    )
+
+
 @operation()
 def modify_custom_config(
     path: str,
@@ -240,14 +360,11 @@ def modify_custom_config(
     )
     ```
     """
-    # validation
+    # load and validate file, state and content come from a single remote command
     # todo: exceptions or log errors?
-    yield FunctionCommand(lambda: _validate_file_state(path, max_file_size_mb), (), {})  # delay, in case file is not present yet
-
-    # load file
-    config_str: str = host.get_fact(files_fact.FileContent, path=path)
-    if config_str is None:
-        raise OperationError(f"Failed to read config file {path}")
+    config_file = host.get_fact(ConfigFile, path=path)
+    _validate_file_state(path, config_file, max_file_size_mb)
+    config_str: str = config_file["content"]
 
     # deserialize
     try:
@@ -261,6 +378,11 @@ def modify_custom_config(
     except Exception as e:
         raise OperationError(f"modify_action failed: {repr(e)}\n{traceback.format_exc()}")
 
+    # modify_structured_config found nothing changed, nothing to serialize or upload
+    if modified_config is _UNCHANGED:
+        host.noop(f"Config file {path} is already up-to-date")
+        return
+
     # serialize
     try:
         modified_config_str = serializer(modified_config)
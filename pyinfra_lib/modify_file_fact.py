@@ -0,0 +1,55 @@
+import base64
+import shlex
+
+from pyinfra.api import FactBase
+
+
+class ConfigFile(FactBase[dict | bool | None]):
+    """
+    Returns state and content of a config file with a single remote command:
+
+    ```
+    {
+        "size": 3928,
+        "mode": 644,
+        "user": "pyinfra",
+        "group": "pyinfra",
+        "content": "...",
+    }
+    ```
+
+    Returns `None` if the path doesn't exist and `False` if it is not a regular file.
+    """
+
+    shell_executable = "sh"
+
+    def command(self, path: str):
+        path = shlex.quote(path)
+        return f"""
+        if [ ! -e {path} ]; then
+            echo missing
+        elif [ ! -f {path} ]; then
+            echo not_file
+        else
+            (stat -c '%s %a %U %G' {path} 2>/dev/null || stat -f '%z %Lp %Su %Sg' {path}) || exit 1
+            # read into a variable first, in a pipeline the exit status of a failed read would be lost
+            content=$(base64 < {path}) || exit 1
+            printf '%s' "$content" | tr -d '\\n' && echo
+        fi
+        """
+
+    def process(self, output) -> dict | bool | None:
+        match output[0]:
+            case "missing":
+                return None
+            case "not_file":
+                return False
+        size, mode, user, group = output[0].split(" ")
+        content = base64.b64decode(output[1] if len(output) > 1 else "").decode("utf-8")
+        return {
+            "size": int(size),
+            "mode": int(mode[-3:]),  # drop setuid/setgid/sticky digit, e.g. 4755 -> 755
+            "user": user,
+            "group": group,
+            "content": content.removesuffix("\n"),  # same as files.FileContent, which joins output lines
+        }
@@ -1,17 +1,32 @@
+import ast
+import hashlib
 import inspect
+import os
+import shlex
+from io import StringIO
 from typing import Callable
 
-from pyinfra import host
+from pyinfra import host, state
 from pyinfra.api import operation, OperationValueError, OperationError
 from pyinfra.facts import server as server_facts
-from pyinfra.facts import files as files_facts
 from pyinfra.operations import files
 
-from lib import remote_python_fact
-from lib.remote_python_util import PythonVersion
+from pyinfra_lib import remote_python_fact
+from pyinfra_lib.remote_python_util import PythonVersion
+
+
+_MAX_COMMAND_BYTES = 120 * 1024
+"""inline scripts are sent as one `sh -c` argument, which Linux caps at 128 KiB (MAX_ARG_STRLEN)"""
+
+_interpreter_cache: dict[tuple[str, str], str] = {}
+"""(host name, minimum version) -> interpreter path, saves filtering the PythonInterpreters fact on every call"""
 
 
 def _get_interpreter(min_version: str) -> str:
+    key = (host.name, min_version)
+    if key in _interpreter_cache:
+        return _interpreter_cache[key]
+
     try:
         required_version = PythonVersion(min_version)
     except ValueError:
@@ -21,27 +36,71 @@ def _get_interpreter(min_version: str) -> str:
     if not interpreters:
         raise OperationError("No Python interpreters found on the remote host.")
 
-    interpreters = [i for i in interpreters if i.version.major == required_version.major and i.version.loose >= required_version.loose]
-    if not interpreters:
+    # interpreters are sorted newest first, so the first match is the newest suitable one
+    interpreter = next(
+        (i for i in interpreters if i.version.major == required_version.major and i.version.parsed >= required_version.parsed),
+        None,
+    )
+    if interpreter is None:
         raise OperationError(f"No suitable Python interpreter found for version [{required_version}].")
 
-    return interpreters[0].path
+    _interpreter_cache[key] = interpreter.path
+    return _interpreter_cache[key]
+
+
+def _script_path() -> str:
+    return f"{host.get_fact(server_facts.TmpDir) or '/tmp'}/pyinfra_remote_python_script.py"
+
+
+def _heredoc_delimiter(code: str) -> str:
+    return f"PYINFRA_EOF_{hashlib.sha256(code.encode()).hexdigest()[:16]}"  # can't be a line of the code itself
+
+
+def _fits_in_command(command: str) -> bool:
+    return len(shlex.quote(command).encode()) <= _MAX_COMMAND_BYTES  # measured the way pyinfra quotes it for `sh -c`
+
+
+def _stdin_command(code: str, interpreter: str) -> str | None:
+    # nothing is written on the remote host, but the heredoc takes the place of the script's stdin
+    delimiter = _heredoc_delimiter(code)
+    command = f"{interpreter} - <<'{delimiter}'\n{code}\n{delimiter}"
+    return command if _fits_in_command(command) else None  # too large scripts are uploaded instead
+
+
+def _single_shot_command(code: str, interpreter: str) -> str | None:
+    # write, execute and remove the script with one remote command instead of separate upload/run/cleanup steps
+    delimiter = _heredoc_delimiter(code)
+    command = (
+        f"script=$(mktemp) && cat > \"$script\" <<'{delimiter}'\n{code}\n{delimiter}\n"
+        f"{interpreter} \"$script\"; rc=$?; rm -f \"$script\"; exit $rc"
+    )
+    return command if _fits_in_command(command) else None  # too large scripts are uploaded instead
+
+
+def _inline_command(code: str, interpreter: str, single_shot: bool, stdin_mode: bool) -> str | None:
+    if stdin_mode:
+        return _stdin_command(code, interpreter)
+    if single_shot:
+        return _single_shot_command(code, interpreter)
+    return None
 
 
 def _upload_and_execute(code: str, interpreter: str, script_path: str):
-    yield from files.block._inner(
-        path=script_path,
-        content=code,
-        try_prevent_shell_expansion=True,
-        present=True,
+    yield from files.put._inner(
+        src=StringIO(code),
+        dest=script_path,
     )
 
-    uploaded_code = '\n'.join(host.get_fact(files_facts.Block, script_path))
-    if uploaded_code != code:
-        raise OperationError(f"Failed to upload code")
+    # verify on the remote side instead of fetching the script back, sha256sum is GNU only, BSD/macOS have shasum
+    checksum = hashlib.sha256(code.encode()).hexdigest()
+    quoted_path = shlex.quote(script_path)
+    yield (
+        f"(sha256sum {quoted_path} 2>/dev/null || shasum -a 256 {quoted_path}) | cut -d' ' -f1 | grep -qx {checksum} "
+        f"|| (echo 'Failed to upload code' >&2; exit 1)"
+    )
 
     # execution
-    yield f"{interpreter} {script_path}"
+    yield f"{interpreter} {quoted_path}"
 
     # cleanup
     yield from files.file._inner(
@@ -55,6 +114,8 @@ def execute_string(
     code: str,
     interpreter: str = None,
     minimum_python_version: str = "3.6",
+    single_shot: bool = True,
+    stdin_mode: bool = False,
 ):
     """
     Execute a given Python code string on a remote host.
@@ -64,6 +125,11 @@ def execute_string(
     @param minimum_python_version: Minimum Python version required for execution. \
         Note that 2.x is considered incompatible with 3.x. \
         Ignored if `interpreter` is provided.
+    @param single_shot: Write, execute and remove the script with a single remote command. \
+        Set to False to upload the script and verify its checksum as separate steps. \
+        Scripts over ~120 KB don't fit in a single command (Linux argument limit) and are always uploaded.
+    @param stdin_mode: Pass the code to the interpreter's stdin without creating a file on the remote host. \
+        The code can't read stdin itself then. Takes precedence over `single_shot`, same size limit applies.
 
     @raise OperationError: If no Python interpreter is found on the remote host.
 
@@ -72,13 +138,14 @@ def execute_string(
     remote_python.execute_string(code="print('Hello, World!')")
     ```
     """
-    script_path = f"{host.get_fact(server_facts.TmpDir) or '/tmp'}/pyinfra_remote_python_script.py"
-
     # interpreter setup
     if not interpreter:
         interpreter = _get_interpreter(minimum_python_version)
 
-    yield from _upload_and_execute(code, interpreter, script_path)
+    if command := _inline_command(code, interpreter, single_shot, stdin_mode):
+        yield command
+    else:
+        yield from _upload_and_execute(code, interpreter, _script_path())
 
 
 @operation(is_idempotent=False)
@@ -86,6 +153,8 @@ def execute_file(
     local_file_path: str,
     interpreter: str = None,
     minimum_python_version: str = "3.6",
+    single_shot: bool = True,
+    stdin_mode: bool = False,
 ):
     """
     Execute a given Python file on a remote host.
@@ -95,6 +164,11 @@ def execute_file(
     @param minimum_python_version: Minimum Python version required for execution. \
         Note that 2.x is considered incompatible with 3.x. \
         Ignored if `interpreter` is provided.
+    @param single_shot: Write, execute and remove the script with a single remote command. \
+        Set to False to upload the file as a separate step. \
+        Files over ~120 KB don't fit in a single command (Linux argument limit) and are always uploaded.
+    @param stdin_mode: Pass the code to the interpreter's stdin without creating a file on the remote host. \
+        The code can't read stdin itself then. Takes precedence over `single_shot`, same size limit applies.
 
     @raise OperationError: If no Python interpreter is found on the remote host.
 
@@ -103,12 +177,20 @@ def execute_file(
     remote_python.execute_file(local_file_path="path/to/file.py", interpreter="/usr/bin/python3")
     ```
     """
-    script_path = f"{host.get_fact(server_facts.TmpDir) or '/tmp'}/pyinfra_remote_python_script.py"
-
     # interpreter setup
     if not interpreter:
         interpreter = _get_interpreter(minimum_python_version)
 
+    if stdin_mode or single_shot:
+        # relative paths are resolved against the deploy directory, same as files.put does
+        with open(os.path.join(state.cwd or "", local_file_path)) as f:
+            code = f.read()
+        if command := _inline_command(code, interpreter, single_shot, stdin_mode):
+            yield command
+            return
+
+    script_path = _script_path()
+
     # script creation
     yield from files.put._inner(
         src=local_file_path,
@@ -116,7 +198,7 @@ def execute_file(
     )
 
     # execution
-    yield f"{interpreter} {script_path}"
+    yield f"{interpreter} {shlex.quote(script_path)}"
 
     # cleanup
     yield from files.file._inner(
@@ -130,8 +212,10 @@ def execute_function(
     func: Callable,
     interpreter: str = None,
     minimum_python_version: str = "3.6",
-    func_args: list[str] = None,
-    func_kwargs: dict[str, str] = None
+    func_args: list[str | int | float | bool | None] = None,
+    func_kwargs: dict[str, str | int | float | bool | None] = None,
+    single_shot: bool = True,
+    stdin_mode: bool = False,
 ):
     """
     Execute a given Python function on a remote host.
@@ -148,8 +232,13 @@ def execute_function(
         Note that 2.x is considered incompatible with 3.x. \
         Ignored if `interpreter` is provided.
     @param func: Function to be executed on the remote host.
-    @param func_args: Positional arguments to pass to the function, only strings are supported.
-    @param func_kwargs: Keyword arguments to pass to the function, only strings are supported.
+    @param func_args: Positional arguments to pass to the function, only literals (str, int, float, bool, None) are supported.
+    @param func_kwargs: Keyword arguments to pass to the function, only literals (str, int, float, bool, None) are supported.
+    @param single_shot: Write, execute and remove the script with a single remote command. \
+        Set to False to upload the script and verify its checksum as separate steps. \
+        Scripts over ~120 KB don't fit in a single command (Linux argument limit) and are always uploaded.
+    @param stdin_mode: Pass the code to the interpreter's stdin without creating a file on the remote host. \
+        The code can't read stdin itself then. Takes precedence over `single_shot`, same size limit applies.
 
     @raise OperationValueError: If the provided object is not a function,\
         is a built-in function, is a method, is a lambda function, or if source code is not available.
@@ -180,8 +269,6 @@ def execute_function(
     if func_kwargs is None:
         func_kwargs = {}
 
-    script_path = f"{host.get_fact(server_facts.TmpDir) or '/tmp'}/pyinfra_remote_python_script.py"
-
     # function validation
     try:
         inspect.getsource(func)
@@ -202,12 +289,30 @@ def execute_function(
     source_lines = inspect.getsourcelines(func)[0]
     if source_lines[0].strip().startswith("lambda"):
         raise OperationValueError("Cannot serialize lambda functions.")
-    indent_level = len(source_lines[0]) - len(source_lines[0].lstrip())
-    source_without_indentation = ''.join([line[indent_level:] for line in source_lines])
-    func_params_str = ", ".join(
-        [f"\"{arg}\"" for arg in func_args] +
-        [f"{key}=\"{value}\"" for key, value in func_kwargs.items()]
+    # strip the first line's indentation from every line; textwrap.dedent would strip nothing
+    # if e.g. a multiline string of a nested function has a line at column 0
+    indent = source_lines[0][:len(source_lines[0]) - len(source_lines[0].lstrip())]
+    dedented_lines = []
+    for line in source_lines:
+        if line.startswith(indent):
+            dedented_lines.append(line[len(indent):])
+        elif not line.strip():
+            dedented_lines.append(line.lstrip(" \t"))
+        else:
+            raise OperationValueError(
+                f"Cannot remove indentation of function [{func.__name__}], line is indented less than its definition: "
+                f"[{line.rstrip()}]. Move the function to module level."
+            )
+    source_without_indentation = "".join(dedented_lines)
+    # arguments are emitted as properly escaped literals, quotes or backslashes in strings are safe
+    call = ast.Call(
+        func=ast.Name(func.__name__, ast.Load()),
+        args=[ast.Constant(arg) for arg in func_args],
+        keywords=[ast.keyword(arg=key, value=ast.Constant(value)) for key, value in func_kwargs.items()],
     )
-    executable_code = source_without_indentation + f"\n\n{func.__name__}({func_params_str})"
+    executable_code = source_without_indentation + f"\n\n{ast.unparse(call)}"
 
-    yield from _upload_and_execute(executable_code, interpreter, script_path)
+    if command := _inline_command(executable_code, interpreter, single_shot, stdin_mode):
+        yield command
+    else:
+        yield from _upload_and_execute(executable_code, interpreter, _script_path())
@@ -1,7 +1,15 @@
 from pyinfra import logger
 from pyinfra.api import FactBase
 
-from remote_python_util import InterpreterInfo, PythonVersion
+from pyinfra_lib.remote_python_util import InterpreterInfo, PythonVersion
+
+
+def _find_interpreters_command(directories: list[str]) -> str:
+    # one find over all directories (missing ones are ignored), then up to 8 `--version` probes in parallel
+    return f"""
+    find -L {" ".join(directories)} -maxdepth 1 -type f -name 'python*' \\( -perm -u+x -o -perm -g+x -o -perm -o+x \\) -print0 2>/dev/null \\
+        | xargs -0 -r -n1 -P8 sh -c 'version=$("$0" --version 2>&1); case "$version" in Python*) echo "$0 $version";; esac'
+    """
 
 
 class PythonInterpreters(FactBase[list[InterpreterInfo]]):
@@ -16,7 +24,7 @@ class PythonInterpreters(FactBase[list[InterpreterInfo]]):
         # linux:
         "/usr/bin",
         "/usr/local/bin",
-        "/opt/local/bin"
+        "/opt/local/bin",
         # macos:
         # todo: check
         "/Library/Frameworks/Python.framework/Versions/*/bin",  # python.org
@@ -26,24 +34,12 @@ class PythonInterpreters(FactBase[list[InterpreterInfo]]):
 
     shell_executable = "sh"
 
-    def command(self, additional_directories: list[str] = None):
-        if additional_directories is None:
-            additional_directories = []
-        directories = " ".join(self._directories_to_search + additional_directories)
-        return f"""
-        directories="{directories}"
+    _default_command = _find_interpreters_command(_directories_to_search)
 
-        for dir in $directories; do
-            if [ -d "$dir" ]; then
-                for python_interpreter in "$dir"/python*; do
-                    version=$("$python_interpreter" --version 2>&1)
-                    if echo "$version" | grep "^Python" >/dev/null; then
-                        echo "$python_interpreter $version"
-                    fi
-                done
-            fi
-        done
-        """
+    def command(self, additional_directories: list[str] = None):
+        if not additional_directories:
+            return self._default_command
+        return _find_interpreters_command(self._directories_to_search + additional_directories)
 
     @staticmethod
     def default() -> list[InterpreterInfo]:
@@ -52,8 +48,11 @@ class PythonInterpreters(FactBase[list[InterpreterInfo]]):
     def process(self, output) -> list[InterpreterInfo]:
         pythons = []
         for line in output:
-            path = line.split(" ")[0]
-            version_str = line.split(" ")[-1]
+            try:
+                path, *_, version_str = line.split(" ")  # e.g. `/usr/bin/python3 Python 3.10.12`
+            except ValueError:
+                logger.warning(f"Unexpected Python interpreter line [{line}]. Skipping.")
+                continue
             try:
                 version = PythonVersion(version_str)
             except ValueError:
@@ -62,4 +61,5 @@ class PythonInterpreters(FactBase[list[InterpreterInfo]]):
 
             pythons.append(InterpreterInfo(version, path))
 
+        pythons.sort(key=lambda i: i.version.parsed, reverse=True)  # newest first, find order is arbitrary
         return pythons
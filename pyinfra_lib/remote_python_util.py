@@ -1,28 +1,29 @@
+import re
 from dataclasses import dataclass
-from distutils.version import LooseVersion
+
+from packaging.version import Version
+
+_VERSION_RE = re.compile(r"([23])\.(\d+)(?:\.|$)")
+"""major (2 or 3) and minor of a version string, e.g. `3.10.12`"""
 
 
 class PythonVersion:
     major: int
     minor: int
-    loose: LooseVersion
+    parsed: Version
     full: str
 
     def __init__(self, version: str):
         if not isinstance(version, str):
             raise ValueError(f"Invalid Python version: {version}")
 
-        bits = version.split(".")
-        if len(bits) < 2:
-            raise ValueError(f"Invalid Python version: {version}")
-        if bits[0] not in ["2", "3"]:
-            raise ValueError(f"Invalid Python version: {version}")
-        if not bits[1].isdigit():
+        match = _VERSION_RE.match(version)
+        if not match:
             raise ValueError(f"Invalid Python version: {version}")
 
-        self.major = int(bits[0])
-        self.minor = int(bits[1])
-        self.loose = LooseVersion(version)
+        self.major = int(match[1])
+        self.minor = int(match[2])
+        self.parsed = Version(version)
         self.full = version
 
     def __str__(self):